@@ -1,6 +1,7 @@
 """InsightAgent Engine public API."""
 
 from .models import (
+    AdAnomaly,
     Insight,
     InsightAgentConfig,
     InsightPayload,
@@ -9,9 +10,11 @@ from .models import (
     MetricSnapshot,
     Recommendation,
 )
+from .benchmarks import PeerBenchmarkIndex, QuantileSketch
 from .orchestrator import InsightAgentEngine
 
 __all__ = [
+    "AdAnomaly",
     "InsightAgentEngine",
     "Insight",
     "InsightAgentConfig",
@@ -19,5 +22,7 @@ __all__ = [
     "InsightRequest",
     "InsightResponse",
     "MetricSnapshot",
+    "PeerBenchmarkIndex",
+    "QuantileSketch",
     "Recommendation",
 ]
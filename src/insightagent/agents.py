@@ -84,9 +84,11 @@ class InsightSynthesisAgent:
                         "type": "tool_result",
                         "tool_call_id": "metrics_snapshot",
                         "output": {
-                            "metrics": [m.model_dump() for m in context.metrics],
+                            "metrics": [m.model_dump() for m in context.focus_metrics or context.metrics],
+                            "anomalies": [anomaly.model_dump() for anomaly in context.anomalies],
                             "resolved_columns": context.resolved_columns,
                             "baseline_insights": [insight.model_dump() for insight in context.baseline_insights],
+                            "peer_percentiles": context.peer_percentiles,
                         },
                     }
                 ]
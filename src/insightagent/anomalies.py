@@ -0,0 +1,261 @@
+"""Vectorized robust anomaly detection over ad-level metrics."""
+
+from __future__ import annotations
+
+from itertools import chain
+from operator import attrgetter
+from typing import Dict, Hashable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .models import AdAnomaly, MetricSnapshot
+
+
+ANOMALY_KPIS: List[str] = ["ctr_percent", "roas", "frequency", "cpa"]
+
+# Scale factors turning MAD / mean absolute deviation into standard-normal units
+# (Iglewicz & Hoaglin modified z-score).
+MAD_SCALE = 0.6745
+MEAN_AD_SCALE = 0.7979
+
+
+class AnomalyScores(NamedTuple):
+    """Per-ad, per-KPI scores for each scope; arrays are shaped ``(kpis, ads)``."""
+
+    global_z: np.ndarray
+    campaign_z: np.ndarray
+    global_flags: np.ndarray
+    campaign_flags: np.ndarray
+
+    @property
+    def score(self) -> np.ndarray:
+        stacked = np.abs(np.concatenate([self.global_z, self.campaign_z]))
+        return np.nan_to_num(stacked, nan=0.0).max(axis=0)
+
+    @property
+    def flagged(self) -> np.ndarray:
+        return (self.global_flags | self.campaign_flags).any(axis=0)
+
+
+def _squash(values: np.ndarray) -> np.ndarray:
+    squashed = np.abs(values)
+    squashed += 1
+    np.divide(values, squashed, out=squashed)
+    squashed += 1
+    squashed *= 0.5
+    return squashed
+
+
+def _unsquash(squashed: np.ndarray) -> np.ndarray:
+    centered = 2 * squashed - 1
+    return centered / (1 - np.abs(centered))
+
+
+def _decode(sorted_keys: np.ndarray, offsets: Optional[np.ndarray]) -> np.ndarray:
+    if offsets is None:
+        return sorted_keys
+    return _unsquash(sorted_keys - offsets)
+
+
+def _per_ad(stat: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Broadcast a ``(..., groups)`` statistic to every ad of its group."""
+
+    if stat.shape[-1] == 1:
+        return stat
+    return np.take(stat, codes, axis=-1)
+
+
+def _group_sums(values: np.ndarray, codes: np.ndarray, n_groups: int) -> np.ndarray:
+    if n_groups == 1:
+        return values.sum(axis=1, dtype=float, keepdims=True)
+    return np.stack([np.bincount(codes, weights=row, minlength=n_groups) for row in values])
+
+
+def _grouped_quantiles(
+    values: np.ndarray, codes: np.ndarray, counts: np.ndarray, quantiles: Sequence[float]
+) -> np.ndarray:
+    """Linear-interpolated quantiles per KPI row and group, shaped ``(q, kpis, groups)``.
+
+    Values are squashed into ``[0, 1)`` and offset by their group code, so a
+    single ``np.sort`` orders every KPI row by group and by value within each
+    group, with missing values pushed to the end.
+    """
+
+    n_groups = counts.shape[1]
+    offsets: Optional[np.ndarray] = None
+    if n_groups == 1:
+        keys = np.sort(values, axis=1)
+    else:
+        keys = _squash(values)
+        np.minimum(keys, 1 - 2 * np.spacing(float(n_groups)), out=keys)
+        keys += codes
+        keys.sort(axis=1)
+        offsets = np.arange(n_groups, dtype=float)
+    counts = counts.astype(np.int64)
+    starts = np.cumsum(counts, axis=1) - counts
+    last = max(keys.shape[1] - 1, 0)
+    result = np.full((len(quantiles),) + counts.shape, np.nan)
+    for i, q in enumerate(quantiles):
+        position = starts + q * np.maximum(counts - 1, 0)
+        lower = np.minimum(np.floor(position).astype(np.int64), last)
+        upper = np.minimum(np.ceil(position).astype(np.int64), last)
+        lower_value = _decode(np.take_along_axis(keys, lower, axis=1), offsets)
+        upper_value = _decode(np.take_along_axis(keys, upper, axis=1), offsets)
+        interpolated = lower_value + (position - lower) * (upper_value - lower_value)
+        result[i] = np.where(counts > 0, interpolated, np.nan)
+    return result
+
+
+def _scope_scores(
+    values: np.ndarray,
+    codes: np.ndarray,
+    n_groups: int,
+    *,
+    z_threshold: float,
+    iqr_multiplier: float,
+    min_group_size: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    counts = _group_sums(~np.isnan(values), codes, n_groups)
+    q1, median, q3 = _grouped_quantiles(values, codes, counts, (0.25, 0.5, 0.75))
+    too_small = counts < min_group_size
+    for stat in (q1, median, q3):
+        stat[too_small] = np.nan
+
+    deviation = values - _per_ad(median, codes)
+    absolute = np.abs(deviation)
+    # Groups below min_group_size now have NaN deviations, so the MAD pass
+    # needs its own counts to keep every group's slice aligned after sorting.
+    deviation_counts = _group_sums(~np.isnan(absolute), codes, n_groups)
+    mad = _grouped_quantiles(absolute, codes, deviation_counts, (0.5,))[0]
+    spread = mad / MAD_SCALE
+    collapsed = mad == 0
+    if collapsed.any():
+        # Fall back to the mean absolute deviation when more than half the
+        # group shares the median value and MAD collapses to zero.
+        absolute_sum = _group_sums(np.nan_to_num(absolute), codes, n_groups)
+        mean_ad = np.divide(
+            absolute_sum, deviation_counts, out=np.zeros_like(absolute_sum), where=deviation_counts > 0
+        )
+        spread[collapsed] = mean_ad[collapsed] / MEAN_AD_SCALE
+    iqr = q3 - q1
+    lower_fence = q1 - iqr_multiplier * iqr
+    upper_fence = q3 + iqr_multiplier * iqr
+    spread, lower_fence, upper_fence = _per_ad(np.stack([spread, lower_fence, upper_fence]), codes)
+
+    z = np.zeros_like(deviation)
+    np.divide(deviation, spread, out=z, where=spread > 0)
+    z[np.isnan(deviation)] = np.nan
+
+    # Both tests must agree: the IQR fence guards against a tiny MAD inflating
+    # z-scores, the z threshold against wide fences on small groups.
+    flags = (values < lower_fence) | (values > upper_fence)
+    flags &= np.abs(z) > z_threshold
+    return z, flags
+
+
+def score_anomalies(
+    values: np.ndarray,
+    codes: np.ndarray,
+    *,
+    z_threshold: float = 3.5,
+    iqr_multiplier: float = 1.5,
+    min_group_size: int = 5,
+    log_scale: bool = True,
+) -> AnomalyScores:
+    """Score a ``(kpis, ads)`` matrix against all ads and within each group.
+
+    ``codes`` maps every ad to a dense integer group id (its campaign).
+    Missing and infinite values are treated as ``NaN`` and never flagged. With ``log_scale``
+    the non-negative, right-skewed ratio KPIs are scored on ``log1p`` so a
+    long tail of strong performers is not mistaken for outliers.
+    """
+
+    values = np.array(values, dtype=float)
+    # Infinite inputs would squash to NaN and shift later groups' slices, so
+    # treat them as missing alongside NaN.
+    values[~np.isfinite(values)] = np.nan
+    if log_scale:
+        values = np.log1p(np.maximum(values, 0))
+    codes = np.asarray(codes, dtype=np.int64)
+    options = dict(z_threshold=z_threshold, iqr_multiplier=iqr_multiplier, min_group_size=min_group_size)
+    global_z, global_flags = _scope_scores(values, np.zeros_like(codes), 1, **options)
+    n_groups = int(codes.max()) + 1 if codes.size else 0
+    campaign_z, campaign_flags = _scope_scores(values, codes, n_groups, **options)
+    return AnomalyScores(global_z, campaign_z, global_flags, campaign_flags)
+
+
+def metrics_matrix(metrics: Sequence[MetricSnapshot], kpis: Sequence[str] = ANOMALY_KPIS) -> np.ndarray:
+    """Stack KPI values into a ``(kpis, ads)`` float matrix with ``NaN`` for gaps."""
+
+    if len(kpis) == 1:
+        flat = list(map(attrgetter(kpis[0]), metrics))
+    else:
+        flat = list(chain.from_iterable(map(attrgetter(*kpis), metrics)))
+    return np.array(flat, dtype=float).reshape(len(metrics), len(kpis)).T
+
+
+def campaign_codes(metrics: Sequence[MetricSnapshot]) -> np.ndarray:
+    names = list(map(attrgetter("campaign_name"), metrics))
+    lookup: Dict[Hashable, int] = {name: code for code, name in enumerate(dict.fromkeys(names))}
+    return np.fromiter(map(lookup.__getitem__, names), dtype=np.int64, count=len(names))
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def detect_anomalies(
+    metrics: Sequence[MetricSnapshot],
+    *,
+    z_threshold: float = 3.5,
+    iqr_multiplier: float = 1.5,
+    min_group_size: int = 5,
+    limit: Optional[int] = None,
+) -> tuple[List[AdAnomaly], int]:
+    """Return the most anomalous flagged ads first, plus the total flagged count.
+
+    With ``limit``, only the top ``limit`` ads by score are turned into
+    :class:`AdAnomaly` models; the rest are selected away in NumPy.
+    """
+
+    if not metrics:
+        return [], 0
+    scores = score_anomalies(
+        metrics_matrix(metrics),
+        campaign_codes(metrics),
+        z_threshold=z_threshold,
+        iqr_multiplier=iqr_multiplier,
+        min_group_size=min_group_size,
+    )
+    overall = scores.score
+    flagged_rows = np.flatnonzero(scores.flagged)
+    total_flagged = int(flagged_rows.size)
+    if limit is not None and limit < total_flagged:
+        flagged_rows = flagged_rows[np.argpartition(-overall[flagged_rows], limit - 1)[:limit]]
+    # Highest score first; ties keep row order so results are deterministic.
+    flagged_rows = flagged_rows[np.lexsort((flagged_rows, -overall[flagged_rows]))]
+
+    anomalies: List[AdAnomaly] = []
+    for row in flagged_rows.tolist():
+        flags: List[str] = []
+        for scope, z, scope_flags in (
+            ("global", scores.global_z, scores.global_flags),
+            ("campaign", scores.campaign_z, scores.campaign_flags),
+        ):
+            for k, kpi in enumerate(ANOMALY_KPIS):
+                if scope_flags[k, row]:
+                    flags.append(f"{kpi}:{scope}:{'high' if z[k, row] > 0 else 'low'}")
+        metric = metrics[row]
+        anomalies.append(
+            AdAnomaly(
+                row_index=row,
+                campaign_name=metric.campaign_name,
+                ad_id=metric.ad_id,
+                ad_name=metric.ad_name,
+                score=float(overall[row]),
+                flags=flags,
+                global_z={kpi: _optional(scores.global_z[k, row]) for k, kpi in enumerate(ANOMALY_KPIS)},
+                campaign_z={kpi: _optional(scores.campaign_z[k, row]) for k, kpi in enumerate(ANOMALY_KPIS)},
+            )
+        )
+    return anomalies, total_flagged
@@ -0,0 +1,187 @@
+"""Persistent peer benchmark index for percentile-based KPIs."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field, PrivateAttr
+
+from .models import ChannelType, MetricSnapshot
+
+
+BENCHMARK_KPIS: List[str] = [
+    "ctr_percent",
+    "roas",
+    "frequency",
+    "atc_to_purchase_percent",
+    "ctr_drop_vs_prev7_percent",
+]
+
+
+class QuantileSketch(BaseModel):
+    """Mergeable weighted-centroid sketch of a KPI distribution.
+
+    Centroids are kept sorted by mean and compacted into at most
+    ``max_centroids`` equal-weight bins, so updates and merges stay bounded
+    while ranking a value only needs a binary search over the centroids.
+    """
+
+    max_centroids: int = Field(default=256, ge=2)
+    means: List[float] = Field(default_factory=list)
+    weights: List[float] = Field(default_factory=list)
+
+    _cache: Optional[tuple[np.ndarray, np.ndarray, np.ndarray, float]] = PrivateAttr(default=None)
+
+    @property
+    def count(self) -> float:
+        return self._arrays()[3] if self.means else 0.0
+
+    def update(self, values: Iterable[Optional[float]]) -> None:
+        arr = np.array([v for v in values if v is not None], dtype=float)
+        arr = arr[np.isfinite(arr)]
+        self._absorb(arr, np.ones_like(arr))
+
+    def merge(self, other: QuantileSketch) -> None:
+        self._absorb(np.array(other.means, dtype=float), np.array(other.weights, dtype=float))
+
+    def _absorb(self, means: np.ndarray, weights: np.ndarray) -> None:
+        if means.size == 0:
+            return
+        all_means = np.concatenate([np.array(self.means, dtype=float), means])
+        all_weights = np.concatenate([np.array(self.weights, dtype=float), weights])
+        order = np.argsort(all_means, kind="stable")
+        all_means, all_weights = all_means[order], all_weights[order]
+        if all_means.size > self.max_centroids:
+            all_means, all_weights = _compact(all_means, all_weights, self.max_centroids)
+        self.means = all_means.tolist()
+        self.weights = all_weights.tolist()
+        self._cache = None
+
+    def _arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        """Return centroid means, weight centers, cumulative weights (leading 0) and total."""
+
+        if self._cache is None:
+            means = np.array(self.means, dtype=float)
+            weights = np.array(self.weights, dtype=float)
+            cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+            centers = cumulative[:-1] + weights / 2
+            self._cache = (means, centers, cumulative, float(cumulative[-1]))
+        return self._cache
+
+    def percentile(self, value: float) -> Optional[float]:
+        """Return the percentile rank (0–100) of ``value`` among observed peers.
+
+        Values tied with observed centroids get the mid-rank of the tie block,
+        so a KPI shared by many peers (e.g. zero conversions) ranks in the middle
+        of that block rather than at its top.
+        """
+
+        if not self.means:
+            return None
+        means, centers, cumulative, total = self._arrays()
+        left = int(np.searchsorted(means, value, side="left"))
+        right = int(np.searchsorted(means, value, side="right"))
+        if right > left:
+            rank = (cumulative[left] + cumulative[right]) / 2
+            return float(rank / total * 100)
+        idx = left
+        if idx == 0:
+            return 0.0
+        if idx == means.size:
+            return 100.0
+        lo, hi = idx - 1, idx
+        frac = (value - means[lo]) / (means[hi] - means[lo])
+        rank = centers[lo] + frac * (centers[hi] - centers[lo])
+        return float(rank / total * 100)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the KPI value at quantile ``q`` (0–1)."""
+
+        if not self.means:
+            return None
+        means, centers, _, total = self._arrays()
+        return float(np.interp(q * total, centers, means))
+
+
+def _compact(means: np.ndarray, weights: np.ndarray, max_centroids: int) -> tuple[np.ndarray, np.ndarray]:
+    total = weights.sum()
+    centers = np.cumsum(weights) - weights / 2
+    bins = np.minimum((centers / total * max_centroids).astype(int), max_centroids - 1)
+    binned_weights = np.bincount(bins, weights=weights, minlength=max_centroids)
+    binned_sums = np.bincount(bins, weights=means * weights, minlength=max_centroids)
+    keep = binned_weights > 0
+    return binned_sums[keep] / binned_weights[keep], binned_weights[keep]
+
+
+class PeerBenchmarkIndex(BaseModel):
+    """Per-channel KPI sketches built incrementally from historical runs.
+
+    Writers sharing a file should persist through :meth:`merge_into`, which
+    folds a run's delta into the latest on-disk copy instead of overwriting
+    it. Without file locking, two writers saving at the same instant can still
+    drop one delta; updates are never corrupted or double counted.
+    """
+
+    kpis: List[str] = Field(default_factory=lambda: list(BENCHMARK_KPIS))
+    min_peer_count: int = Field(default=30, ge=1)
+    sketches: Dict[ChannelType, Dict[str, QuantileSketch]] = Field(default_factory=dict)
+
+    def update(self, channel: ChannelType, metrics: Sequence[MetricSnapshot]) -> None:
+        channel_sketches = self.sketches.setdefault(channel, {})
+        for kpi in self.kpis:
+            sketch = channel_sketches.setdefault(kpi, QuantileSketch())
+            sketch.update(getattr(metric, kpi) for metric in metrics)
+
+    def merge(self, other: PeerBenchmarkIndex) -> None:
+        for channel, other_sketches in other.sketches.items():
+            channel_sketches = self.sketches.setdefault(channel, {})
+            for kpi, other_sketch in other_sketches.items():
+                channel_sketches.setdefault(kpi, QuantileSketch()).merge(other_sketch)
+
+    def percentile(self, channel: ChannelType, kpi: str, value: Optional[float]) -> Optional[float]:
+        if value is None:
+            return None
+        sketch = self.sketches.get(channel, {}).get(kpi)
+        if sketch is None or sketch.count < self.min_peer_count:
+            return None
+        return sketch.percentile(value)
+
+    def rank_snapshot(self, channel: ChannelType, metric: MetricSnapshot) -> Dict[str, Optional[float]]:
+        return {kpi: self.percentile(channel, kpi, getattr(metric, kpi)) for kpi in self.kpis}
+
+    def rank_metrics(
+        self, channel: ChannelType, metrics: Sequence[MetricSnapshot]
+    ) -> List[Dict[str, Optional[float]]]:
+        return [self.rank_snapshot(channel, metric) for metric in metrics]
+
+    def save(self, path: str | Path) -> None:
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(self.model_dump_json())
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def merge_into(cls, path: str | Path, delta: PeerBenchmarkIndex) -> PeerBenchmarkIndex:
+        """Merge ``delta`` into the index stored at ``path`` and persist the result."""
+
+        latest = cls.load(path)
+        latest.merge(delta)
+        latest.save(path)
+        return latest
+
+    @classmethod
+    def load(cls, path: str | Path) -> PeerBenchmarkIndex:
+        source = Path(path)
+        if not source.exists():
+            return cls()
+        return cls.model_validate_json(source.read_text(encoding="utf-8"))
@@ -2,11 +2,30 @@
 
 from __future__ import annotations
 
-from typing import List
+from typing import Callable, List, Mapping, Optional, Sequence
 
 from .models import Insight, MetricSnapshot, Recommendation
 
 
+def roas_break_even_insight(metric: MetricSnapshot) -> Insight | None:
+    if metric.roas is None or metric.roas >= 1.0:
+        return None
+    return Insight(
+        label="ROAS < 1",
+        signal="Campaign is losing money",
+        recommendation=Recommendation(
+            summary="Pause and rebuild offer targeting to reach profitability",
+            actions=[
+                "Pause worst performing ad sets",
+                "Reassess targeting and bidding",
+                "Rebuild funnel messaging",
+            ],
+            priority="high",
+        ),
+        confidence=0.8,
+    )
+
+
 def roas_low_insight(metric: MetricSnapshot) -> Insight | None:
     if metric.roas is None:
         return None
@@ -25,12 +44,47 @@ def roas_low_insight(metric: MetricSnapshot) -> Insight | None:
             ),
             confidence=0.7,
         )
-    if metric.roas is not None and metric.roas < 1.0:
+    return roas_break_even_insight(metric)
+
+
+def ctr_health_conversion_gap(metric: MetricSnapshot) -> Insight | None:
+    if metric.ctr_percent is None or metric.atc_to_purchase_percent is None:
+        return None
+    if metric.ctr_percent >= 1.5 and metric.atc_to_purchase_percent < 20:
         return Insight(
-            label="ROAS < 1",
-            signal="Campaign is losing money",
+            label="CTR healthy but conversion lagging",
+            signal="Traffic quality is solid but conversion funnel underperforms",
             recommendation=Recommendation(
-                summary="Pause and rebuild offer targeting to reach profitability",
+                summary="Audit landing page and checkout to fix conversion leakage",
+                actions=[
+                    "A/B test landing page copy and load speed",
+                    "Analyze checkout drop-off recordings",
+                    "Validate tracking for adds to cart vs purchases",
+                ],
+                priority="medium",
+            ),
+            confidence=0.75,
+        )
+    return None
+
+
+PeerPercentiles = Mapping[str, Optional[float]]
+
+
+def roas_percentile_insight(metric: MetricSnapshot, percentiles: PeerPercentiles) -> Insight | None:
+    # Break-even does not depend on the vertical, so peers never silence it.
+    break_even = roas_break_even_insight(metric)
+    if break_even:
+        return break_even
+    rank = percentiles.get("roas")
+    if rank is None:
+        return None
+    if rank < 10:
+        return Insight(
+            label="ROAS bottom decile",
+            signal=f"ROAS ranks at the {rank:.0f}th percentile of channel peers",
+            recommendation=Recommendation(
+                summary="Pause and rebuild offer targeting to catch up with peers",
                 actions=[
                     "Pause worst performing ad sets",
                     "Reassess targeting and bidding",
@@ -40,16 +94,36 @@ def roas_low_insight(metric: MetricSnapshot) -> Insight | None:
             ),
             confidence=0.8,
         )
+    if rank < 25:
+        return Insight(
+            label="ROAS bottom quartile",
+            signal=f"ROAS ranks at the {rank:.0f}th percentile of channel peers",
+            recommendation=Recommendation(
+                summary="Test new hooks and cap frequency to lift ROAS toward the peer median",
+                actions=[
+                    "Launch 2–3 new creatives focusing on fresh angles",
+                    "Rotate new thumbnail variants to fight fatigue",
+                    "Apply frequency cap or refresh audience",
+                ],
+                priority="high",
+            ),
+            confidence=0.7,
+        )
     return None
 
 
-def ctr_health_conversion_gap(metric: MetricSnapshot) -> Insight | None:
-    if metric.ctr_percent is None or metric.atc_to_purchase_percent is None:
+def ctr_conversion_gap_percentile_insight(metric: MetricSnapshot, percentiles: PeerPercentiles) -> Insight | None:
+    ctr_rank = percentiles.get("ctr_percent")
+    conversion_rank = percentiles.get("atc_to_purchase_percent")
+    if ctr_rank is None or conversion_rank is None:
         return None
-    if metric.ctr_percent >= 1.5 and metric.atc_to_purchase_percent < 20:
+    if ctr_rank >= 60 and conversion_rank < 25:
         return Insight(
-            label="CTR healthy but conversion lagging",
-            signal="Traffic quality is solid but conversion funnel underperforms",
+            label="CTR above peers but conversion lagging",
+            signal=(
+                f"CTR ranks at the {ctr_rank:.0f}th percentile while ATC→purchase "
+                f"ranks at the {conversion_rank:.0f}th percentile of channel peers"
+            ),
             recommendation=Recommendation(
                 summary="Audit landing page and checkout to fix conversion leakage",
                 actions=[
@@ -64,11 +138,28 @@ def ctr_health_conversion_gap(metric: MetricSnapshot) -> Insight | None:
     return None
 
 
-def generate_rule_based_insights(metrics: List[MetricSnapshot]) -> List[Insight]:
+AbsoluteRule = Callable[[MetricSnapshot], Optional[Insight]]
+PercentileRule = Callable[[MetricSnapshot, PeerPercentiles], Optional[Insight]]
+
+# Each percentile rule falls back to its absolute-threshold counterpart when
+# the peer index has no ranking for the KPIs it needs.
+RULES: List[tuple[PercentileRule, AbsoluteRule, tuple[str, ...]]] = [
+    (roas_percentile_insight, roas_low_insight, ("roas",)),
+    (ctr_conversion_gap_percentile_insight, ctr_health_conversion_gap, ("ctr_percent", "atc_to_purchase_percent")),
+]
+
+
+def generate_rule_based_insights(
+    metrics: List[MetricSnapshot], percentiles: Optional[Sequence[PeerPercentiles]] = None
+) -> List[Insight]:
     insights: List[Insight] = []
-    for metric in metrics:
-        for fn in (roas_low_insight, ctr_health_conversion_gap):
-            insight = fn(metric)
+    for position, metric in enumerate(metrics):
+        ranks: PeerPercentiles = percentiles[position] if percentiles else {}
+        for percentile_fn, absolute_fn, kpis in RULES:
+            if all(ranks.get(kpi) is not None for kpi in kpis):
+                insight = percentile_fn(metric, ranks)
+            else:
+                insight = absolute_fn(metric)
             if insight:
                 insights.append(insight)
     return insights
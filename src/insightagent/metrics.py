@@ -32,14 +32,22 @@ COLUMN_CANONICAL_NAMES: Dict[str, List[str]] = {
 DERIVED_METRICS = {
     "ctr_percent": lambda r: safe_pct(r.get("clicks"), r.get("impressions")),
     "atc_to_purchase_percent": lambda r: safe_pct(r.get("purchases"), r.get("adds_to_cart")),
+    "cpa": lambda r: safe_ratio(r.get("spend"), r.get("purchases")),
     "ctr_drop_vs_prev7_percent": lambda r: safe_delta_pct(r.get("ctr_7d_percent"), r.get("ctr_prev7_percent")),
 }
 
 
-def safe_pct(numerator: Optional[float], denominator: Optional[float]) -> Optional[float]:
+def safe_ratio(numerator: Optional[float], denominator: Optional[float]) -> Optional[float]:
     if numerator is None or denominator in (None, 0):
         return None
-    return float(numerator) / float(denominator) * 100
+    return float(numerator) / float(denominator)
+
+
+def safe_pct(numerator: Optional[float], denominator: Optional[float]) -> Optional[float]:
+    ratio = safe_ratio(numerator, denominator)
+    if ratio is None:
+        return None
+    return ratio * 100
 
 
 def safe_delta_pct(current: Optional[float], previous: Optional[float]) -> Optional[float]:
@@ -34,6 +34,17 @@ class InsightAgentConfig(BaseModel):
     fuzzy_column_match: bool = Field(default=True)
     min_confidence: float = Field(default=0.75)
     max_workers: int = Field(default=4)
+    benchmark_index_path: Optional[str] = Field(
+        default=None, description="JSON file holding the persistent peer benchmark index"
+    )
+    update_benchmark_index: bool = Field(default=True)
+    anomaly_z_threshold: float = Field(default=3.5, gt=0)
+    anomaly_iqr_multiplier: float = Field(default=1.5, gt=0)
+    anomaly_min_group_size: int = Field(default=5, ge=2)
+    focus_on_anomalies: bool = Field(
+        default=True, description="Send only flagged ads to heuristics and the LLM when any are flagged"
+    )
+    max_focus_ads: int = Field(default=50, ge=1, description="Most anomalous ads forwarded to heuristics and the LLM")
 
 
 class MetricSnapshot(BaseModel):
@@ -51,12 +62,24 @@ class MetricSnapshot(BaseModel):
     purchase_value: Optional[float] = None
     adds_to_cart: Optional[int] = None
     atc_to_purchase_percent: Optional[float] = Field(default=None, description="ATC to purchase conversion %")
+    cpa: Optional[float] = Field(default=None, description="Cost per acquisition")
     ctr_7d_percent: Optional[float] = None
     ctr_prev7_percent: Optional[float] = None
     ctr_drop_vs_prev7_percent: Optional[float] = None
     status: Optional[Literal["pause", "fix", "test", "keep"]] = None
 
 
+class AdAnomaly(BaseModel):
+    row_index: int
+    campaign_name: Optional[str] = None
+    ad_id: Optional[str] = None
+    ad_name: Optional[str] = None
+    score: float = Field(description="Largest absolute robust z-score across KPIs and scopes")
+    flags: List[str] = Field(default_factory=list, description="Flagged KPIs as kpi:scope:direction")
+    global_z: Dict[str, Optional[float]] = Field(default_factory=dict)
+    campaign_z: Dict[str, Optional[float]] = Field(default_factory=dict)
+
+
 class InsightPayload(BaseModel):
     rows: List[Mapping[str, Any]]
 
@@ -76,6 +99,16 @@ class InsightContext(BaseModel):
     channel: ChannelType
     config: InsightAgentConfig
     baseline_insights: List[Insight] = Field(default_factory=list)
+    anomalies: List[AdAnomaly] = Field(
+        default_factory=list, description="Top flagged ads by score, capped at max_focus_ads"
+    )
+    anomaly_count: int = Field(default=0, description="Total flagged ads before the cap")
+    focus_metrics: List[MetricSnapshot] = Field(
+        default_factory=list, description="Snapshots forwarded to heuristics and the LLM"
+    )
+    peer_percentiles: List[Dict[str, Optional[float]]] = Field(
+        default_factory=list, description="Peer percentile ranks aligned with focus_metrics"
+    )
 
 
 class Recommendation(BaseModel):
@@ -8,8 +8,10 @@ from typing import Any, Dict, List, Mapping, Optional
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.runnables import RunnableConfig
 from .agents import build_graph
+from .anomalies import detect_anomalies
+from .benchmarks import PeerBenchmarkIndex
 from .metrics import canonicalize_headers, extract_metrics
-from .models import InsightAgentConfig, InsightContext, InsightRequest, InsightResponse
+from .models import InsightAgentConfig, InsightContext, InsightRequest, InsightResponse, MetricSnapshot
 from .heuristics import generate_rule_based_insights
 
 
@@ -34,6 +36,9 @@ class InsightAgentEngine:
         self._config = config or InsightAgentConfig()
         self._column_resolver = ColumnResolver(enable_fuzzy=self._config.fuzzy_column_match)
         self._graph: Optional[Any] = None
+        self._benchmark_index: Optional[PeerBenchmarkIndex] = None
+        if self._config.benchmark_index_path:
+            self._benchmark_index = PeerBenchmarkIndex.load(self._config.benchmark_index_path)
 
     def _ensure_graph(self) -> Any:
         if self._graph is None:
@@ -43,22 +48,56 @@ class InsightAgentEngine:
     def _build_context(self, rows: List[Mapping[str, Any]]) -> InsightContext:
         resolved_columns = self._column_resolver.resolve(rows)
         metrics = extract_metrics(rows, resolved_columns)
-        baseline_insights = generate_rule_based_insights(metrics)
+        anomalies, anomaly_count = detect_anomalies(
+            metrics,
+            z_threshold=self._config.anomaly_z_threshold,
+            iqr_multiplier=self._config.anomaly_iqr_multiplier,
+            min_group_size=self._config.anomaly_min_group_size,
+            limit=self._config.max_focus_ads,
+        )
+        if anomalies and self._config.focus_on_anomalies:
+            focus_metrics = [metrics[anomaly.row_index] for anomaly in anomalies]
+        else:
+            focus_metrics = metrics
+        peer_percentiles = self._rank_against_peers(focus_metrics)
+        baseline_insights = generate_rule_based_insights(focus_metrics, peer_percentiles)
         return InsightContext(
             resolved_columns=resolved_columns,
             metrics=metrics,
             channel=self._config.channel,
             config=self._config,
             baseline_insights=baseline_insights,
+            anomalies=anomalies,
+            anomaly_count=anomaly_count,
+            focus_metrics=focus_metrics,
+            peer_percentiles=peer_percentiles,
         )
 
+    def _rank_against_peers(self, focus_metrics: List[MetricSnapshot]) -> List[Dict[str, Optional[float]]]:
+        if self._benchmark_index is None:
+            return []
+        return self._benchmark_index.rank_metrics(self._config.channel, focus_metrics)
+
+    def _record_peers(self, metrics: List[MetricSnapshot]) -> None:
+        index = self._benchmark_index
+        path = self._config.benchmark_index_path
+        if index is None or path is None or not self._config.update_benchmark_index:
+            return
+        delta = PeerBenchmarkIndex(kpis=index.kpis, min_peer_count=index.min_peer_count)
+        delta.update(self._config.channel, metrics)
+        # Merge into the on-disk copy so engines sharing the file keep each other's runs.
+        self._benchmark_index = PeerBenchmarkIndex.merge_into(path, delta)
+
     async def arun(self, request: InsightRequest, *, config: Optional[RunnableConfig] = None) -> InsightResponse:
         context = self._build_context(request.payload.rows)
+        # Record after ranking so a run is never benchmarked against itself.
+        await asyncio.to_thread(self._record_peers, context.metrics)
         graph = self._ensure_graph()
         state = {"context": context}
         result = await graph.ainvoke(state, config=config)
         response: InsightResponse = result["insight_response"]
         response.metadata.setdefault("resolved_columns", context.resolved_columns)
+        response.metadata.setdefault("anomalous_ads", context.anomaly_count)
         return response
 
     def run(self, request: InsightRequest, *, config: Optional[RunnableConfig] = None) -> InsightResponse:
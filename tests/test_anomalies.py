@@ -0,0 +1,105 @@
+import numpy as np
+
+from insightagent import anomalies as anomalies_module
+from insightagent.anomalies import _grouped_quantiles, detect_anomalies, score_anomalies
+from insightagent.models import MetricSnapshot
+
+
+def test_grouped_quantiles_match_numpy_per_group():
+    rng = np.random.default_rng(7)
+    values = rng.lognormal(size=(2, 500))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    codes = rng.integers(0, 6, 500)
+    counts = np.stack([np.bincount(codes, weights=~np.isnan(row), minlength=6) for row in values])
+
+    result = _grouped_quantiles(values, codes, counts, (0.25, 0.5, 0.75))
+
+    for group in range(6):
+        for kpi in range(2):
+            expected = np.nanquantile(values[kpi, codes == group], [0.25, 0.5, 0.75])
+            assert np.allclose(result[:, kpi, group], expected)
+
+
+def test_outlier_flagged_within_campaign_only():
+    values = np.concatenate([np.linspace(0.9, 1.1, 20), np.linspace(2.8, 3.2, 20)])[np.newaxis, :]
+    codes = np.repeat([0, 1], 20)
+    # Unremarkable across the whole account, but far above its campaign peers.
+    values[0, 3] = 1.8
+
+    scores = score_anomalies(values, codes, log_scale=False)
+
+    assert scores.campaign_flags[0, 3]
+    assert not scores.global_flags[0, 3]
+    assert scores.flagged.sum() == 1
+
+
+def test_detect_anomalies_orders_flagged_ads_by_score():
+    metrics = [
+        MetricSnapshot(campaign_name="A", ad_id=str(i), ctr_percent=1.5 + 0.01 * i, roas=2.0 + 0.02 * i, cpa=20.0)
+        for i in range(30)
+    ]
+    metrics[4] = MetricSnapshot(campaign_name="A", ad_id="4", ctr_percent=1.52, roas=25.0, cpa=20.0)
+    metrics[9] = MetricSnapshot(campaign_name="A", ad_id="9", ctr_percent=9.0, roas=2.1, cpa=400.0)
+
+    anomalies, total = detect_anomalies(metrics)
+
+    assert total == 2
+    assert sorted(anomaly.ad_id for anomaly in anomalies) == ["4", "9"]
+    assert anomalies[0].score >= anomalies[1].score
+    assert "roas:global:high" in next(a for a in anomalies if a.ad_id == "4").flags
+    assert detect_anomalies(metrics[:3]) == ([], 0)
+
+
+def test_small_campaigns_do_not_shift_later_campaign_statistics():
+    large = np.linspace(4.8, 5.2, 20)
+    large[7] = 9.0
+    small = np.tile([1.0, 2.0, 3.0, 4.0], 10)
+    values = np.concatenate([small, large])[np.newaxis, :]
+    codes = np.concatenate([np.repeat(np.arange(10), 4), np.full(20, 10)])
+
+    mixed = score_anomalies(values, codes, log_scale=False)
+    alone = score_anomalies(large[np.newaxis, :], np.zeros(20, dtype=np.int64), log_scale=False)
+
+    assert np.isclose(mixed.campaign_z[0, 47], alone.campaign_z[0, 7])
+    assert mixed.campaign_flags[0, 47]
+    assert np.isnan(mixed.campaign_z[0, :40]).all()
+
+
+def test_infinite_values_are_treated_as_missing():
+    values = np.concatenate([np.linspace(0.9, 1.1, 20), np.linspace(4.8, 5.2, 20)])[np.newaxis, :]
+    values[0, 27] = 9.0
+    codes = np.repeat([0, 1], 20)
+    with_gap = values.copy()
+    with_gap[0, 4] = np.nan
+    with_inf = values.copy()
+    with_inf[0, 4] = np.inf
+
+    expected = score_anomalies(with_gap, codes)
+    scores = score_anomalies(with_inf, codes)
+
+    assert np.isclose(scores.campaign_z[0, 27], expected.campaign_z[0, 27])
+    assert np.allclose(scores.global_z, expected.global_z, equal_nan=True)
+    assert not scores.flagged[4]
+
+
+def test_detect_anomalies_builds_only_limit_models(monkeypatch):
+    metrics = [
+        MetricSnapshot(campaign_name="A", ad_id=str(i), ctr_percent=1.5 + 0.01 * i, roas=2.0 + 0.02 * i)
+        for i in range(40)
+    ]
+    for position, roas in ((3, 12.0), (11, 40.0), (20, 25.0)):
+        metrics[position] = MetricSnapshot(campaign_name="A", ad_id=str(position), ctr_percent=1.55, roas=roas)
+    built = []
+    original = anomalies_module.AdAnomaly
+
+    def counting_anomaly(**fields):
+        built.append(fields["ad_id"])
+        return original(**fields)
+
+    monkeypatch.setattr(anomalies_module, "AdAnomaly", counting_anomaly)
+
+    anomalies, total = detect_anomalies(metrics, limit=2)
+
+    assert total == 3
+    assert built == ["11", "20"]
+    assert [anomaly.ad_id for anomaly in anomalies] == ["11", "20"]
@@ -0,0 +1,57 @@
+import math
+
+from insightagent.benchmarks import PeerBenchmarkIndex, QuantileSketch
+from insightagent.models import ChannelType, MetricSnapshot
+
+
+def test_sketch_ranks_and_merges_within_tolerance():
+    left = QuantileSketch(max_centroids=64)
+    right = QuantileSketch(max_centroids=64)
+    left.update(float(v) for v in range(0, 5000))
+    right.update(float(v) for v in range(5000, 10000))
+    left.merge(right)
+
+    assert len(left.means) <= 64
+    assert math.isclose(left.count, 10000)
+    assert math.isclose(left.percentile(2500.0), 25.0, abs_tol=1.0)
+    assert math.isclose(left.quantile(0.9), 9000.0, rel_tol=0.02)
+    assert left.percentile(-1.0) == 0.0
+    assert left.percentile(20000.0) == 100.0
+
+
+def test_index_requires_minimum_peers_and_round_trips(tmp_path):
+    index = PeerBenchmarkIndex(min_peer_count=10)
+    peers = [MetricSnapshot(roas=float(v) / 10) for v in range(1, 41)]
+    index.update(ChannelType.TIKTOK, peers[:5])
+    assert index.percentile(ChannelType.TIKTOK, "roas", 2.0) is None
+
+    index.update(ChannelType.TIKTOK, peers[5:])
+    path = tmp_path / "peers.json"
+    index.save(path)
+    restored = PeerBenchmarkIndex.load(path)
+
+    ranks = restored.rank_snapshot(ChannelType.TIKTOK, MetricSnapshot(roas=0.3))
+    assert ranks["roas"] is not None and ranks["roas"] < 10
+    assert ranks["ctr_percent"] is None
+    assert restored.percentile(ChannelType.GOOGLE, "roas", 0.3) is None
+
+
+def test_sketch_gives_tied_values_their_mid_rank():
+    zero_heavy = QuantileSketch()
+    zero_heavy.update([0.0] * 40 + [float(v) for v in range(1, 61)])
+    assert math.isclose(zero_heavy.percentile(0.0), 20.0)
+    assert math.isclose(zero_heavy.percentile(60.0), 99.5)
+
+    all_equal = QuantileSketch()
+    all_equal.update([2.5] * 40)
+    assert math.isclose(all_equal.percentile(2.5), 50.0)
+    assert all_equal.percentile(2.4) == 0.0
+    assert all_equal.percentile(2.6) == 100.0
+
+
+def test_zero_conversion_ranks_in_bottom_quartile_among_zero_heavy_peers():
+    index = PeerBenchmarkIndex(min_peer_count=10)
+    peers = [MetricSnapshot(atc_to_purchase_percent=0.0) for _ in range(40)]
+    peers += [MetricSnapshot(atc_to_purchase_percent=float(v)) for v in range(1, 61)]
+    index.update(ChannelType.FACEBOOK, peers)
+    assert index.percentile(ChannelType.FACEBOOK, "atc_to_purchase_percent", 0.0) < 25
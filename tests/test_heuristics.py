@@ -14,3 +14,17 @@ def test_ctr_gap_detected():
     insights = generate_rule_based_insights([snapshot])
     matching = [ins for ins in insights if "conversion" in ins.signal.lower()]
     assert matching
+
+
+def test_percentile_rules_override_absolute_thresholds():
+    snapshot = MetricSnapshot(roas=3.5, ctr_percent=0.9, atc_to_purchase_percent=30)
+    percentiles = [{"roas": 8.0, "ctr_percent": 75.0, "atc_to_purchase_percent": 12.0}]
+    labels = [insight.label for insight in generate_rule_based_insights([snapshot], percentiles)]
+    assert "ROAS bottom decile" in labels
+    assert "CTR above peers but conversion lagging" in labels
+
+
+def test_roas_below_break_even_flagged_even_when_peers_rank_it_average():
+    snapshot = MetricSnapshot(roas=0.4)
+    labels = [insight.label for insight in generate_rule_based_insights([snapshot], [{"roas": 40.0}])]
+    assert labels == ["ROAS < 1"]
@@ -5,7 +5,9 @@ from langchain_core.messages import AIMessage, BaseMessage
 from langchain_core.outputs import ChatGeneration, ChatResult
 from langchain_core.language_models.chat_models import BaseChatModel
 
-from insightagent.models import InsightPayload, InsightRequest
+from insightagent import orchestrator
+from insightagent.benchmarks import PeerBenchmarkIndex
+from insightagent.models import ChannelType, InsightAgentConfig, InsightPayload, InsightRequest, MetricSnapshot
 from insightagent.orchestrator import InsightAgentEngine
 
 
@@ -13,8 +15,10 @@ class FakeChatModel(BaseChatModel):
     def __init__(self, payload: AIMessage) -> None:
         super().__init__()
         self._payload = payload
+        self._prompts: List[List[BaseMessage]] = []
 
     def _generate(self, messages: List[BaseMessage], stop: Any | None = None, run_manager: Any | None = None) -> ChatResult:
+        self._prompts.append(messages)
         generation = ChatGeneration(message=self._payload)
         return ChatResult(generations=[generation])
 
@@ -72,3 +76,106 @@ def test_engine_returns_structured_response():
     response = engine.run(request)
     assert response.insights[0].recommendation.summary.startswith("Test 2–3")
     assert response.metadata["resolved_columns"]["campaign_name"] == "Campaign name"
+
+
+def empty_llm() -> FakeChatModel:
+    return FakeChatModel(AIMessage(content=json.dumps({"insights": []})))
+
+
+def prompt_output(llm: FakeChatModel) -> dict:
+    return llm._prompts[-1][-1].content[0]["output"]
+
+
+def test_engines_rank_against_and_share_persisted_peer_index(tmp_path):
+    path = tmp_path / "peers.json"
+    seed = PeerBenchmarkIndex()
+    seed.update(ChannelType.FACEBOOK, [MetricSnapshot(roas=1.0 + 0.1 * i) for i in range(40)])
+    seed.save(path)
+    config = InsightAgentConfig(benchmark_index_path=str(path))
+    first_llm = empty_llm()
+    first = InsightAgentEngine(llm=first_llm, config=config)
+    second = InsightAgentEngine(llm=empty_llm(), config=config)
+    request = InsightRequest(payload=InsightPayload(rows=[{"Campaign name": "Test", "ROAS": 1.2}]), config=config)
+
+    first.run(request)
+    second.run(request)
+
+    percentiles = prompt_output(first_llm)["peer_percentiles"]
+    assert percentiles[0]["roas"] is not None and percentiles[0]["roas"] < 10
+    persisted = PeerBenchmarkIndex.load(path)
+    assert persisted.sketches[ChannelType.FACEBOOK]["roas"].count == 42
+    assert [p.name for p in tmp_path.iterdir()] == ["peers.json"]
+
+
+def campaign_rows(count: int) -> list:
+    return [
+        {
+            "Campaign name": "Evergreen",
+            "Ad ID": str(i),
+            "Spend": 100.0,
+            "Impressions": 1000,
+            "Clicks": 20,
+            "Purchases": 5,
+            "ROAS": 2.0 + 0.01 * i,
+            "Frequency": 1.5,
+        }
+        for i in range(count)
+    ]
+
+
+def test_focus_ads_capped_to_most_anomalous():
+    rows = campaign_rows(40)
+    rows[3]["ROAS"] = 12.0
+    rows[8]["ROAS"] = 40.0
+    llm = empty_llm()
+    config = InsightAgentConfig(max_focus_ads=1)
+    engine = InsightAgentEngine(llm=llm, config=config)
+
+    response = engine.run(InsightRequest(payload=InsightPayload(rows=rows), config=config))
+
+    output = prompt_output(llm)
+    assert [metric["ad_id"] for metric in output["metrics"]] == ["8"]
+    assert [anomaly["ad_id"] for anomaly in output["anomalies"]] == ["8"]
+    assert response.metadata["anomalous_ads"] == 2
+
+
+def test_only_flagged_ads_reach_heuristics_and_prompt(tmp_path, monkeypatch):
+    path = tmp_path / "peers.json"
+    seed = PeerBenchmarkIndex()
+    seed.update(ChannelType.FACEBOOK, [MetricSnapshot(roas=1.0 + 0.1 * i) for i in range(40)])
+    seed.save(path)
+    seen = {}
+
+    def recording_insights(metrics, percentiles=None):
+        seen["metrics"], seen["percentiles"] = metrics, percentiles
+        return []
+
+    monkeypatch.setattr(orchestrator, "generate_rule_based_insights", recording_insights)
+    rows = campaign_rows(40)
+    rows[5]["ROAS"] = 40.0
+    llm = empty_llm()
+    config = InsightAgentConfig(benchmark_index_path=str(path))
+    engine = InsightAgentEngine(llm=llm, config=config)
+
+    response = engine.run(InsightRequest(payload=InsightPayload(rows=rows), config=config))
+
+    assert [metric.ad_id for metric in seen["metrics"]] == ["5"]
+    assert len(seen["percentiles"]) == 1 and seen["percentiles"][0]["roas"] == 100.0
+    output = prompt_output(llm)
+    assert [metric["ad_id"] for metric in output["metrics"]] == ["5"]
+    assert output["peer_percentiles"] == seen["percentiles"]
+    assert response.metadata["anomalous_ads"] == 1
+    persisted = PeerBenchmarkIndex.load(path)
+    assert persisted.sketches[ChannelType.FACEBOOK]["roas"].count == 80
+
+
+def test_all_ads_reach_prompt_when_nothing_is_flagged():
+    llm = empty_llm()
+    engine = InsightAgentEngine(llm=llm)
+
+    response = engine.run(InsightRequest(payload=InsightPayload(rows=campaign_rows(12))))
+
+    output = prompt_output(llm)
+    assert len(output["metrics"]) == 12
+    assert output["anomalies"] == []
+    assert response.metadata["anomalous_ads"] == 0